@@ -336,6 +336,7 @@ class FlukeENV(metaclass=Singleton):
     - The device (``"cpu"``, ``"cuda[:N]"``, ``"auto"``, ``"mps"``);
     - The ``seed`` for reproducibility;
     - If the models are stored in memory or on disk (when not in use);
+    - If the models are kept on the device between rounds;
     - The evaluation configuration;
     - The saving settings;
     - The progress bars for the federated learning process, clients and the server;
@@ -348,6 +349,7 @@ class FlukeENV(metaclass=Singleton):
     _device_ids: list[int] = []
     _seed: int = 0
     _inmemory: bool = True
+    _keep_on_device: bool = False
     _cache: FlukeCache | None = None
 
     # saving settings
@@ -395,6 +397,7 @@ class FlukeENV(metaclass=Singleton):
         self.set_seed(cfg.exp.seed)
         self.set_device(cfg.exp.device)
         self.set_inmemory(cfg.exp.inmemory)
+        self.set_keep_on_device(cfg.exp.keep_on_device)
         self.set_save_options(**cfg.save)
         self.set_eval_cfg(**cfg.eval)
 
@@ -635,6 +638,16 @@ class FlukeENV(metaclass=Singleton):
         """
         self._inmemory = inmemory
 
+    def set_keep_on_device(self, keep: bool) -> None:
+        """Set if the models are kept on the device between rounds.
+
+        Args:
+            keep (bool): If ``True``, the models are not moved back to the CPU after the local
+                training. This avoids the host-device transfers at every round at the cost of
+                keeping the models in the device memory.
+        """
+        self._keep_on_device = keep
+
     def get_cache(self) -> FlukeCache:
         """Get the cache.
 
@@ -672,6 +685,14 @@ class FlukeENV(metaclass=Singleton):
         """
         return self._inmemory
 
+    def is_keep_on_device(self) -> bool:
+        """Check if the models are kept on the device between rounds.
+
+        Returns:
+            bool: If ``True``, the models are kept on the device between rounds.
+        """
+        return self._keep_on_device
+
     def force_close(self) -> None:
         """Force close the progress bars and the live renderer."""
 
@@ -126,6 +126,17 @@ class CentralizedFL(ServerObserver):
         if (clients is not None and server is None) or (clients is None and server is not None):
             raise ValueError("Both clients and server must be provided or neither of them.")
 
+        if FlukeENV().is_keep_on_device() and not self.can_keep_on_device():
+            warnings.warn(
+                f"The algorithm {self.__class__.__name__} does not support keeping the models on "
+                "the device between rounds. The option keep_on_device will be ignored."
+            )
+        elif FlukeENV().is_keep_on_device() and not FlukeENV().is_inmemory():
+            warnings.warn(
+                "The option keep_on_device has no effect when inmemory is False since the client "
+                "models are moved to the disk cache after every local update."
+            )
+
         self._id = str(uuid.uuid4().hex)
         FlukeENV().open_cache(self._id)
 
@@ -192,6 +203,15 @@ class CentralizedFL(ServerObserver):
         """
         return True
 
+    def can_keep_on_device(self) -> bool:
+        """Return whether the algorithm supports keeping the models on the device between rounds
+        (see :meth:`fluke.FlukeENV.set_keep_on_device`). If it does not, the option is ignored.
+
+        Returns:
+            bool: Whether the algorithm supports keeping the models on the device.
+        """
+        return False
+
     def get_optimizer_class(self) -> type[torch.optim.Optimizer]:
         """Get the optimizer class.
 
@@ -7,7 +7,6 @@ References:
 """
 
 import sys
-from copy import deepcopy
 from typing import Collection, Sequence
 
 import torch
@@ -20,7 +19,6 @@ from ..algorithms import CentralizedFL  # NOQA
 from ..client import Client  # NOQA
 from ..data import FastDataLoader  # NOQA
 from ..server import Server  # NOQA
-from ..utils.model import state_dict_zero_like  # NOQA
 
 __all__ = ["FedAVGMServer", "FedAVGM"]
 
@@ -52,24 +50,29 @@ class FedAVGMServer(Server):
 
     @torch.no_grad()
     def aggregate(self, eligible: Sequence[Client], client_models: Collection[Module]) -> None:
-        prev_model_sd = deepcopy(self.model.state_dict())
+        # The momentum is kept as a single flat tensor over the floating point entries of the
+        # state dictionary, so that the update is done with whole-vector operations.
+        # The previous model is directly snapshotted as a flat vector (torch.cat always copies)
+        prev_model_sd = self.model.state_dict()
+        keys = [key for key, value in prev_model_sd.items() if value.is_floating_point()]
+        prev_flat = torch.cat([prev_model_sd[key].reshape(-1) for key in keys])
+
         super().aggregate(eligible, client_models)
         agg_model_sd = self.model.state_dict()
+        agg_flat = torch.cat([agg_model_sd[key].reshape(-1) for key in keys])
 
         if self.momentum_vector is None:
-            self.momentum_vector = state_dict_zero_like(prev_model_sd)
+            self.momentum_vector = torch.zeros_like(prev_flat)
         else:
-            for key in prev_model_sd:
-                self.momentum_vector[key].data = (
-                    self.hyper_params.momentum * self.momentum_vector[key].data
-                    + prev_model_sd[key].data
-                    - agg_model_sd[key].data
-                )
-
-        for key in prev_model_sd:
-            agg_model_sd[key].data = prev_model_sd[key].data - self.momentum_vector[key].data
-
-        self.model.load_state_dict(agg_model_sd)
+            self.momentum_vector.mul_(self.hyper_params.momentum).add_(prev_flat).sub_(agg_flat)
+
+        # The tensors of the state dictionary share the storage with the model, thus the new
+        # parameters are directly copied into the model
+        new_params = prev_flat.sub_(self.momentum_vector).split(
+            [agg_model_sd[key].numel() for key in keys]
+        )
+        for key, param in zip(keys, new_params):
+            agg_model_sd[key].copy_(param.view_as(agg_model_sd[key]))
 
 
 class FedAVGM(CentralizedFL):
@@ -8,7 +8,7 @@ References:
 
 import sys
 from copy import deepcopy
-from typing import Collection, Sequence
+from typing import Collection, Generator, Iterable, Sequence
 
 import numpy as np
 import torch
@@ -23,44 +23,42 @@ from ..comm import Message  # NOQA
 from ..config import OptimizerConfigurator  # NOQA
 from ..data import FastDataLoader  # NOQA
 from ..server import Server  # NOQA
-from ..utils import clear_cuda_cache  # NOQA
 from ..utils.model import aggregate_models, safe_load_state_dict  # NOQA
 from . import CentralizedFL  # NOQA
 
 __all__ = ["FedDynClient", "FedDynServer", "FedDyn"]
 
 
-def get_all_params_of(model: Module, copy: bool = True) -> torch.Tensor:
-    result = None
-    for param in model.parameters():
-        if not param.requires_grad:
-            continue
+def get_all_params_of(model: Module) -> torch.Tensor:
+    params = [param for param in model.parameters() if param.requires_grad]
+    if not params:
+        return None
 
-        if result is None:
-            result = param.clone().detach().reshape(-1) if copy else param.reshape(-1)
-        else:
-            result = (
-                torch.cat((result, param.clone().detach().reshape(-1)), 0)
-                if copy
-                else torch.cat((result, param.reshape(-1)), 0)
-            )
+    result = torch.empty(
+        sum(param.numel() for param in params), dtype=params[0].dtype, device=params[0].device
+    )
+    idx = 0
+    for param in params:
+        length = param.numel()
+        result[idx : idx + length].view_as(param).copy_(param.detach())
+        idx += length
     return result
 
 
+@torch.no_grad()
 def load_all_params(device: torch.device, model: torch.nn.Module, params: torch.Tensor) -> None:
-    dict_param = deepcopy(dict(model.named_parameters()))
+    params = params.to(device)
     idx = 0
-    for name, param in model.named_parameters():
+    for param in model.parameters():
         if not param.requires_grad:
             continue
-        weights = param.data
-        length = len(weights.reshape(-1))
-        dict_param[name].data.copy_(
-            params[idx : idx + length].clone().detach().reshape(weights.shape).to(device)
-        )
+        length = param.numel()
+        param.copy_(params[idx : idx + length].view(param.shape))
         idx += length
 
-    model.load_state_dict(dict_param, strict=False)
+
+def _has_buffers(model: Module) -> bool:
+    return next(model.buffers(), None) is not None
 
 
 class FedDynClient(Client):
@@ -118,7 +116,15 @@ class FedDynClient(Client):
         )
 
     def send_model(self) -> None:
-        self.channel.send(Message(self.model, "model", self.index, inmemory=True), "server")
+        if _has_buffers(self.model):
+            self.channel.send(Message(self.model, "model", self.index, inmemory=True), "server")
+        else:
+            # Without buffers, the flat vector of the parameters is the whole state of the model
+            # and it is much cheaper to copy through the channel than the module itself
+            self.channel.send(
+                Message(get_all_params_of(self.model), "model_flat", self.index, inmemory=True),
+                "server",
+            )
         self.channel.send(Message(self.prev_grads, "grads", self.index, inmemory=True), "server")
 
     def fit(self, override_local_epochs: int = 0) -> float:
@@ -130,10 +136,16 @@ class FedDynClient(Client):
         self.model.to(self.device)
 
         alpha_coef_adpt = self.hyper_params.alpha / self.weight
-        server_params = get_all_params_of(self.model).to(self.device)
+        server_params = get_all_params_of(self.model)
 
         for params in self.model.parameters():
             params.requires_grad = True
+        # the set of trainable parameters and the penalty coefficients are constant during
+        # the local training
+        trainable_params = list(self.model.parameters())
+        penalty_coefs = (alpha_coef_adpt * (self.prev_grads - server_params)).split(
+            [param.numel() for param in trainable_params]
+        )
 
         if not self.optimizer:
             w_dec = alpha_coef_adpt + self.weight_decay
@@ -152,12 +164,14 @@ class FedDynClient(Client):
                 loss = self.hyper_params.loss_fn(y_hat, y)
 
                 # Dynamic regularization
-                curr_params = get_all_params_of(self.model, False).to(self.device)
                 # penalty = -torch.sum(curr_params * self.prev_grads)
                 # penalty += 0.5 * alpha_coef_adpt * torch.sum((curr_params - server_params) ** 2)
-                penalty = alpha_coef_adpt * torch.sum(
-                    curr_params * (-server_params + self.prev_grads)
-                )
+                penalty = torch.stack(
+                    [
+                        torch.dot(param.view(-1), coef)
+                        for param, coef in zip(trainable_params, penalty_coefs)
+                    ]
+                ).sum()
                 loss = loss + penalty
 
                 loss.backward()
@@ -168,12 +182,12 @@ class FedDynClient(Client):
             self.scheduler.step()
 
         # update the previous gradients
-        curr_params = get_all_params_of(self.model).to(self.device)
+        curr_params = get_all_params_of(self.model)
         self.prev_grads += alpha_coef_adpt * (server_params - curr_params)
 
         running_loss /= epochs * len(self.train_set)
-        self.model.cpu()
-        clear_cuda_cache()
+        if not FlukeENV().is_keep_on_device():
+            self.model.cpu()
         return running_loss
 
 
@@ -190,6 +204,7 @@ class FedDynServer(Server):
         self.alpha = alpha
         self.device = FlukeENV().get_device()
         self.cld_mdl = deepcopy(self.model).to(self.device)
+        self._stack_buf = None
 
     def broadcast_model(self, eligible: Sequence[Client]) -> None:
         self.channel.broadcast(
@@ -212,45 +227,83 @@ class FedDynServer(Server):
         )
         weights = weights / np.sum(weights) * self.n_clients
 
-        for i, client in enumerate(self.clients):
-            self.channel.send(Message(weights[i], "weight", "server"), client.index)
+        # each client only needs its own scalar weight: broadcasting the whole vector would
+        # copy it to every client
+        for client, weight in zip(self.clients, weights.tolist()):
+            self.channel.send(Message(weight, "weight", "server", inmemory=True), client.index)
 
         for client in self.clients:
             client._receive_weights()
 
         return super().fit(n_rounds, eligible_perc)
 
+    def _stack(self, tensors: Iterable[torch.Tensor], n_rows: int) -> torch.Tensor:
+        # The (K, D) matrix is allocated once and reused across rounds (and for both parameters
+        # and gradients) since the number of selected clients and the model size do not change.
+        # The rows are filled with copy_ as soon as the tensors are yielded, so the received
+        # vectors never sit in memory all together, and they can come from any device.
+        params = [param for param in self.model.parameters() if param.requires_grad]
+        shape = (n_rows, sum(param.numel() for param in params))
+        if self._stack_buf is None or self._stack_buf.shape != shape:
+            self._stack_buf = torch.empty(shape, dtype=params[0].dtype, device=self.device)
+        n_filled = 0
+        for tensor in tensors:
+            self._stack_buf[n_filled].copy_(tensor)
+            n_filled += 1
+        return self._stack_buf[:n_filled]
+
+    def receive_client_models(
+        self, eligible: Sequence[Client], state_dict: bool = True
+    ) -> Generator[Module | torch.Tensor, None, None]:
+        if _has_buffers(self.model):
+            yield from super().receive_client_models(eligible, state_dict)
+        else:
+            for client in eligible:
+                yield self.channel.receive("server", client.index, "model_flat").payload
+
+    def _aggregate_flat(self, client_params: Iterable[torch.Tensor], weights: list[float]) -> None:
+        # the parameters of the clients are stacked in a (K, D) matrix and aggregated with
+        # a single matrix-vector product
+        client_params = self._stack(client_params, len(weights))
+        weights = torch.tensor(weights, dtype=client_params.dtype, device=self.device)
+        agg_params = get_all_params_of(self.model).to(self.device)
+        agg_params.lerp_(weights @ client_params, self.hyper_params.lr)
+        load_all_params(self.device, self.model, agg_params)
+
     @torch.no_grad()
-    def aggregate(self, eligible: Sequence[Client], client_models: Collection[Module]) -> None:
+    def aggregate(
+        self, eligible: Sequence[Client], client_models: Collection[Module | torch.Tensor]
+    ) -> None:
         weights = self._get_client_weights(eligible)
-        agg_model_sd = aggregate_models(
-            self.model, client_models, weights, eta=self.hyper_params.lr, inplace=False
-        ).state_dict()
-
-        avg_grad = None
-        grad_count = 0
-        for client in eligible:
-            pg = self.channel.receive("server", client.index, msg_type="grads").payload
-            if pg is not None:
-                grad_count += 1
-                if avg_grad is None:
-                    avg_grad = pg.clone().detach()
-                else:
-                    avg_grad += pg.clone().detach()
-
-        if grad_count > 0:
-            avg_grad /= grad_count
-
-        self.model.load_state_dict(agg_model_sd)
+        if _has_buffers(self.model):
+            if FlukeENV().is_keep_on_device():
+                # the client models have not been moved back to the CPU after the local training
+                server_device = next(self.model.parameters()).device
+                client_models = (model.to(server_device) for model in client_models)
+            aggregate_models(self.model, client_models, weights, eta=self.hyper_params.lr)
+        else:
+            self._aggregate_flat(client_models, weights)
+
+        grads = (
+            self.channel.receive("server", client.index, msg_type="grads").payload
+            for client in eligible
+        )
+        # the received gradients are stacked in a (K, D) matrix on the server's device and
+        # averaged with a single reduction
+        avg_grad = self._stack((pg for pg in grads if pg is not None), len(eligible)).mean(0)
+
         load_all_params(
             self.device,
             self.cld_mdl,
-            get_all_params_of(self.model).to(self.device) + avg_grad.to(self.device),
+            get_all_params_of(self.model).to(self.device) + avg_grad,
         )
 
 
 class FedDyn(CentralizedFL):
 
+    def can_keep_on_device(self) -> bool:
+        return True
+
     def get_client_class(self) -> type[Client]:
         return FedDynClient
 
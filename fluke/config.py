@@ -251,6 +251,7 @@ class Configuration(DDict):
                 },
                 "seed": {"type": "integer", "required": True, "default": 42},
                 "inmemory": {"type": "boolean", "required": True, "default": True},
+                "keep_on_device": {"type": "boolean", "required": False, "default": False},
             },
         },
         "eval": {
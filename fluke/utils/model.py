@@ -742,6 +742,11 @@ def safe_load_state_dict(model1: Module, model2_state_dict: dict) -> None:
         model1 (torch.nn.Module): The model to load the state dictionary.
         model2_state_dict (dict): The state dictionary.
     """
+    if not STATE_DICT_KEYS_TO_IGNORE:
+        # nothing to ignore: avoid building the state dictionary of model1 and the per-key checks
+        model1.load_state_dict(model2_state_dict)
+        return
+
     model1_state_dict = model1.state_dict()
     new_state_dict = OrderedDict()
     for key, value in model2_state_dict.items():
@@ -939,38 +944,45 @@ def aggregate_models(
     model_params = dict(target_model.named_parameters())
     model_buffers = dict(target_model.named_buffers())  # Includes running_mean, running_var, etc.
 
-    # Initialize accumulators for parameters
-    avg_params = {key: torch.zeros_like(param.data) for key, param in model_params.items()}
-    avg_buffers = {
-        key: torch.zeros_like(buffer.data)
-        for key, buffer in model_buffers.items()
-        if "num_batches_tracked" not in key
-    }
+    # Keys of the buffers to average and of the num_batches_tracked buffers
+    buffer_keys = [key for key in model_buffers.keys() if "num_batches_tracked" not in key]
+    nbt_keys = [key for key in model_buffers.keys() if "num_batches_tracked" in key]
+    avg_params, avg_buffers = {}, {}
 
     max_num_batches_tracked = 0  # Track the max num_batches_tracked
 
     # Compute weighted sum (weights already sum to 1, so no division needed)
-    for m, w in zip(models, weights):
-        for key, param in m.named_parameters():
-            avg_params[key].add_(param.data, alpha=w)
+    # The accumulators are initialized with the (weighted) first model
+    for i, (m, w) in enumerate(zip(models, weights)):
+        # the weights can also be a tensor (e.g., in FedNova)
+        w = float(w)
+        m_params = dict(m.named_parameters())
+        m_buffers = dict(m.named_buffers())
+
+        for key in model_params.keys():
+            if i == 0:
+                avg_params[key] = m_params[key].data * w
+            else:
+                avg_params[key].add_(m_params[key].data, alpha=w)
 
-        for key, buffer in m.named_buffers():
-            if "num_batches_tracked" not in key:
-                avg_buffers[key].add_(buffer.data, alpha=w)
+        for key in buffer_keys:
+            if i == 0:
+                avg_buffers[key] = m_buffers[key].data * w
             else:
-                max_num_batches_tracked = max(max_num_batches_tracked, buffer.item())
+                avg_buffers[key].add_(m_buffers[key].data, alpha=w)
+
+        for key in nbt_keys:
+            max_num_batches_tracked = max(max_num_batches_tracked, m_buffers[key].item())
 
     for key in model_params.keys():
         model_params[key].data.lerp_(avg_params[key], eta)  # Soft update
 
-    for key in model_buffers.keys():
-        if "num_batches_tracked" not in key:
-            model_buffers[key].data.lerp_(avg_buffers[key], eta)
+    for key in buffer_keys:
+        model_buffers[key].data.lerp_(avg_buffers[key], eta)
 
     # Assign max num_batches_tracked
-    for key in model_buffers.keys():
-        if "num_batches_tracked" in key:
-            model_buffers[key].data.fill_(max_num_batches_tracked)
+    for key in nbt_keys:
+        model_buffers[key].data.fill_(max_num_batches_tracked)
 
     return target_model
 
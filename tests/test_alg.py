@@ -2,10 +2,14 @@ import gc
 import shutil
 import sys
 import tempfile
+import warnings
 from typing import Any
+from unittest.mock import patch
 
 import numpy as np
-from torch.nn import CrossEntropyLoss, Module
+import pytest
+import torch
+from torch.nn import BatchNorm1d, CrossEntropyLoss, Linear, Module
 from torch.optim import SGD
 
 sys.path.append(".")
@@ -13,6 +17,7 @@ sys.path.append("..")
 
 from fluke import DDict, FlukeENV  # NOQA
 from fluke.algorithms import CentralizedFL, PersonalizedFL  # NOQA
+from fluke.algorithms.feddyn import FedDyn, FedDynServer, get_all_params_of  # NOQA
 from fluke.client import Client  # NOQA
 from fluke.comm import ChannelObserver, Message  # NOQA
 from fluke.config import Configuration  # NOQA
@@ -23,6 +28,7 @@ from fluke.nets import MNIST_2NN  # NOQA
 from fluke.server import Server  # NOQA
 from fluke.utils import ClientObserver, ServerObserver, get_class_from_qualified_name  # NOQA
 from fluke.utils.log import Log  # NOQA
+from fluke.utils.model import aggregate_models  # NOQA
 
 FlukeENV().set_evaluator(ClassificationEval(1, 10))
 FlukeENV().set_eval_cfg(post_fit=True, pre_fit=True)
@@ -221,9 +227,10 @@ def get_splitter(cfg):
 SPLITTER = None
 
 
-def _test_algo(exp_config, alg_config, oncpu=True, tol=1e-5):
+def _test_algo(exp_config, alg_config, oncpu=True, tol=1e-5, keep_on_device=False):
     accs = []
     cfg = Configuration(exp_config, alg_config)
+    cfg.exp.keep_on_device = keep_on_device
     if oncpu:
         cfg.exp.device = "cpu"
     else:
@@ -335,10 +342,104 @@ def test_fedbn():
     #                         "./tests/configs/alg/fedbn.yaml", oncpu=False)
 
 
+class MNIST_2NN_BN(Module):
+    def __init__(self):
+        super().__init__()
+        self.fc1 = Linear(28 * 28, 100)
+        self.bn1 = BatchNorm1d(100)
+        self.fc2 = Linear(100, 10)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.fc2(torch.relu(self.bn1(self.fc1(x.view(-1, 28 * 28)))))
+
+
 def test_feddyn():
     feddyn, log = _test_algo("./tests/configs/exp.yaml", "./tests/configs/alg/feddyn.yaml")
     # feddyn, log = _test_algo("./tests/configs/exp.yaml",
     #                          "./tests/configs/alg/feddyn.yaml", oncpu=False)
+    feddyn, log = _test_algo("./tests/configs/exp.yaml", "./tests/configs/alg/feddyn_bn.yaml")
+
+
+@pytest.fixture
+def reset_keep_on_device():
+    yield
+    FlukeENV().set_keep_on_device(False)
+
+
+def _run_feddyn(alg_config, keep_on_device, device="cpu"):
+    cfg = Configuration("./tests/configs/exp.yaml", alg_config)
+    cfg.exp.device = device
+    cfg.exp.inmemory = True
+    cfg.exp.keep_on_device = keep_on_device
+    FlukeENV().configure(cfg)
+    algo = FedDyn(cfg.protocol.n_clients, get_splitter(cfg), cfg.method.hyperparameters)
+    # spy on the models moved back to the CPU
+    with patch.object(Module, "cpu", autospec=True, side_effect=Module.cpu) as cpu_spy:
+        algo.run(1, cfg.protocol.eligible_perc)
+    FlukeENV().close_cache()
+    shutil.rmtree(f"tests/tmp/tmp_{algo.id}", ignore_errors=True)
+    offloaded = {id(call.args[0]) for call in cpu_spy.call_args_list}
+    trained = [client for client in algo.clients if client.prev_grads is not None]
+    assert trained
+    return trained, offloaded
+
+
+def test_feddyn_keep_on_device(reset_keep_on_device):
+    for alg_config in ["./tests/configs/alg/feddyn.yaml", "./tests/configs/alg/feddyn_bn.yaml"]:
+        feddyn, log = _test_algo("./tests/configs/exp.yaml", alg_config, keep_on_device=True)
+
+    for keep_on_device in [False, True]:
+        trained, offloaded = _run_feddyn("./tests/configs/alg/feddyn.yaml", keep_on_device)
+        for client in trained:
+            assert (id(client.model) in offloaded) != keep_on_device
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="CUDA is not available")
+def test_feddyn_keep_on_device_cuda(reset_keep_on_device):
+    for alg_config in ["./tests/configs/alg/feddyn.yaml", "./tests/configs/alg/feddyn_bn.yaml"]:
+        trained, _ = _run_feddyn(alg_config, True, device="cuda")
+        for client in trained:
+            assert next(client.model.parameters()).is_cuda
+            assert client.prev_grads.is_cuda
+
+
+def test_keep_on_device_warning(reset_keep_on_device):
+    FlukeENV().set_inmemory(True)
+    FlukeENV().set_keep_on_device(True)
+    cfg = Configuration("./tests/configs/exp.yaml", "./tests/configs/alg/fedavg.yaml")
+    splitter = get_splitter(cfg)
+    with pytest.warns(UserWarning, match="does not support keeping the models"):
+        CentralizedFL(2, splitter, cfg.method.hyperparameters)
+
+    cfg = Configuration("./tests/configs/exp.yaml", "./tests/configs/alg/feddyn.yaml")
+    with warnings.catch_warnings(record=True) as records:
+        warnings.simplefilter("always")
+        FedDyn(2, splitter, cfg.method.hyperparameters)
+    assert not any("keep_on_device" in str(record.message) for record in records)
+
+    FlukeENV().set_inmemory(False)
+    try:
+        with pytest.warns(UserWarning, match="no effect when inmemory is False"):
+            feddyn = FedDyn(2, splitter, cfg.method.hyperparameters)
+        FlukeENV().close_cache()
+        shutil.rmtree(f"tests/tmp/tmp_{feddyn.id}", ignore_errors=True)
+    finally:
+        FlukeENV().set_inmemory(True)
+
+
+def test_feddyn_flat_aggregation():
+    models = [MNIST_2NN() for _ in range(3)]
+    weights = [0.2, 0.3, 0.5]
+
+    server = FedDynServer(MNIST_2NN(), None, [])
+    server.hyper_params.lr = 0.5
+    expected = aggregate_models(
+        server.model, models, weights, eta=server.hyper_params.lr, inplace=False
+    )
+    server._aggregate_flat([get_all_params_of(model) for model in models], weights)
+
+    for param, exp_param in zip(server.model.parameters(), expected.parameters()):
+        assert torch.allclose(param, exp_param, atol=1e-6)
 
 
 def test_fedexp():
@@ -64,6 +64,10 @@ def test_env():
 
     shutil.rmtree("tmp/tmp", ignore_errors=True)
 
+    env.set_keep_on_device(True)
+    assert env.is_keep_on_device()
+    env.set_keep_on_device(False)
+
     env.set_inmemory(False)
     env.open_cache("test_env")
     assert env.get_cache() is not None
@@ -2,6 +2,7 @@ import json
 import shutil
 import sys
 import tempfile
+from copy import deepcopy
 from unittest.mock import patch
 
 import pytest
@@ -808,8 +809,32 @@ def test_agg():
     loss2.backward()
     optimizer.step()
     optimizer2.step()
-    net = FedBN_CNN()
-    _ = aggregate_models(net, [net1, net2], [0.5, 0.5], eta=1.0)
+    # make the batch norm buffers of the two models different
+    net1.train()
+    net2.train()
+    net1(x)
+    net2(torch.randn(10, 1, 28, 28))
+    net2(torch.randn(10, 1, 28, 28))
+
+    sd1, sd2 = net1.state_dict(), net2.state_dict()
+    for weights in [[0.3, 0.7], torch.tensor([0.3, 0.7])]:
+        net = FedBN_CNN()
+        sd = net.state_dict()
+        sd_prev = deepcopy(sd)
+        _ = aggregate_models(net, [net1, net2], weights, eta=1.0)
+        for key in sd:
+            if "num_batches_tracked" in key:
+                assert sd[key] == max(sd1[key], sd2[key])
+            else:
+                assert torch.allclose(sd[key], 0.3 * sd1[key] + 0.7 * sd2[key], atol=1e-6)
+
+        net = FedBN_CNN()
+        net.load_state_dict(sd_prev)
+        _ = aggregate_models(net, [net1, net2], weights, eta=0.5)
+        for key in sd:
+            if "num_batches_tracked" not in key:
+                expected = 0.5 * sd_prev[key] + 0.5 * (0.3 * sd1[key] + 0.7 * sd2[key])
+                assert torch.allclose(net.state_dict()[key], expected, atol=1e-6)
 
 
 def test_alllayeroutput():